@@ -1,5 +1,5 @@
 import os
-import json
+import orjson
 import time
 import feedparser
 import tweepy
@@ -7,8 +7,19 @@ from openai import OpenAI
 from dotenv import load_dotenv
 import requests
 import mimetypes
+import re
+import html
+import shutil
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from bs4 import BeautifulSoup
 
+try:
+    import lxml  # noqa: F401  (C parser, much faster than html.parser)
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
 # ==========================
 # 🔧 Setup
 # ==========================
@@ -41,39 +52,141 @@ twitter = tweepy.Client(
     wait_on_rate_limit=True
 )
 
+# Shared HTTP session so repeated hosts reuse pooled keep-alive connections
+session = requests.Session()
+session.headers.update({'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'})
+
 # ==========================
 # 📡 RSS Feed
 # ==========================
 FEEDS = ["https://www.animenewsnetwork.com/news/rss.xml?ann-edition=us"]
 
-POSTED_FILE = "posted.json"
+# Headline filters for non-news entries
+EXCLUDE_RE = re.compile(r'review|interview|column|editorial|interest', re.IGNORECASE)
+NEWS_TAGS = frozenset({'news', 'press release', 'announcement'})
+
+# Fast path for the common <meta property="og:image" content="..."> tag
+OG_IMAGE_RE = re.compile(
+    rb'<meta[^>]+property=["\']og:image["\'][^>]+content=["\']([^"\']+)', re.IGNORECASE
+)
+
+MAX_TWEET_LEN = 280
+
+POSTED_FILE = "posted.jsonl"
+LEGACY_POSTED_FILE = "posted.json"
+
+REWRITES_FILE = "rewrites.json"
+MAX_CACHED_REWRITES = 512
+
+# In-process cache of posted links, invalidated when the file's mtime or size changes
+_POSTED_CACHE = None
+_POSTED_STAT = None
+
+# Headline rewrites, loaded from REWRITES_FILE on first use
+_REWRITES_CACHE = None
 
 # ==========================
 # 💾 Utility Functions
 # ==========================
+def migrate_posted():
+    """One-shot migration of the old JSON array file to JSONL."""
+    if os.path.exists(POSTED_FILE) or not os.path.exists(LEGACY_POSTED_FILE):
+        return
+    with open(LEGACY_POSTED_FILE, "rb") as f:
+        data = f.read()
+    if not data.lstrip().startswith(b"["):
+        return
+    try:
+        posted = orjson.loads(data)
+    except orjson.JSONDecodeError as e:
+        # Refuse to run rather than repost everything the legacy file recorded
+        raise RuntimeError(f"{LEGACY_POSTED_FILE} is corrupt ({e}); fix or remove it to continue") from e
+    # Write then rename, so a partial posted.jsonl never blocks a retry
+    temp_file = POSTED_FILE + ".tmp"
+    with open(temp_file, "wb") as f:
+        f.write(b"".join(orjson.dumps(link) + b"\n" for link in posted))
+    os.replace(temp_file, POSTED_FILE)
+    print(f"🔁 Migrated {len(posted)} posted links to {POSTED_FILE}.")
+
 def load_posted():
-    if os.path.exists(POSTED_FILE):
-        with open(POSTED_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return []
+    global _POSTED_CACHE, _POSTED_STAT
+    migrate_posted()
+    if not os.path.exists(POSTED_FILE):
+        return []
+    st = os.stat(POSTED_FILE)
+    stat_key = (st.st_mtime_ns, st.st_size)
+    if _POSTED_CACHE is not None and stat_key == _POSTED_STAT:
+        return _POSTED_CACHE
+    posted = []
+    with open(POSTED_FILE, "rb") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                posted.append(orjson.loads(line))
+            except orjson.JSONDecodeError:
+                print(f"⚠️ Dropping corrupt line in {POSTED_FILE}: {line[:80]!r}")
+    _POSTED_CACHE, _POSTED_STAT = posted, stat_key
+    return posted
+
+def save_posted(link):
+    """Append a single posted link instead of rewriting the whole file."""
+    with open(POSTED_FILE, "a+b") as f:
+        # Start a fresh line if a previous write was torn before its newline
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+        f.write(orjson.dumps(link) + b"\n")
+
+def rewrite_key(title):
+    return hashlib.blake2b(title.encode("utf-8"), digest_size=16).hexdigest()
 
-def save_posted(posted):
-    with open(POSTED_FILE, "w", encoding="utf-8") as f:
-        json.dump(posted, f, indent=2)
+def load_rewrites():
+    """Load the headline -> rewrite cache once per process."""
+    global _REWRITES_CACHE
+    if _REWRITES_CACHE is None:
+        _REWRITES_CACHE = {}
+        if os.path.exists(REWRITES_FILE):
+            try:
+                with open(REWRITES_FILE, "rb") as f:
+                    rewrites = orjson.loads(f.read())
+                if isinstance(rewrites, dict):
+                    _REWRITES_CACHE = rewrites
+                else:
+                    print(f"⚠️ Ignoring {REWRITES_FILE}: expected an object")
+            except (OSError, orjson.JSONDecodeError) as e:
+                print(f"⚠️ Ignoring corrupt {REWRITES_FILE}: {e}")
+    return _REWRITES_CACHE
+
+def save_rewrite(title, text):
+    rewrites = load_rewrites()
+    rewrites[rewrite_key(title)] = text
+    while len(rewrites) > MAX_CACHED_REWRITES:
+        del rewrites[next(iter(rewrites))]  # Drop oldest entry
+    with open(REWRITES_FILE, "wb") as f:
+        f.write(orjson.dumps(rewrites))
+
+def fit_tweet(text):
+    """Truncate text with an ellipsis so it fits in a single tweet."""
+    if len(text) <= MAX_TWEET_LEN:
+        return text
+    return text[:MAX_TWEET_LEN - 3].rstrip() + "..."
 
 def download_image(url):
     """Download image from URL and save temporarily."""
     try:
-        response = requests.get(url, stream=True, timeout=10)
-        if response.status_code == 200:
-            content_type = response.headers.get('content-type', '')
-            extension = mimetypes.guess_extension(content_type) or '.jpg'
-            temp_file = f"temp_image{extension}"
-            with open(temp_file, 'wb') as f:
-                for chunk in response.iter_content(1024):
-                    f.write(chunk)
-            return temp_file
-        return None
+        with session.get(url, stream=True, timeout=10) as response:
+            if response.status_code == 200:
+                content_type = response.headers.get('content-type', '')
+                extension = mimetypes.guess_extension(content_type) or '.jpg'
+                temp_file = f"temp_image{extension}"
+                response.raw.decode_content = True
+                with open(temp_file, 'wb') as f:
+                    shutil.copyfileobj(response.raw, f, length=1 << 16)
+                return temp_file
+            return None
     except Exception as e:
         print(f"⚠️ Error downloading image: {e}")
         return None
@@ -81,10 +194,12 @@ def download_image(url):
 def scrape_article_image(url):
     """Scrape the article page for an image."""
     try:
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-        response = requests.get(url, headers=headers, timeout=10)
+        response = session.get(url, timeout=10)
         if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
+            match = OG_IMAGE_RE.search(response.content)
+            if match:
+                return html.unescape(match.group(1).decode("utf-8", "replace"))
+            soup = BeautifulSoup(response.text, HTML_PARSER)
             og_image = soup.find('meta', property='og:image')
             if og_image and og_image.get('content'):
                 return og_image['content']
@@ -112,7 +227,7 @@ def search_google_image(query):
         "rights": "cc_publicdomain"  # Prefer free-to-use images
     }
     try:
-        response = requests.get(url, params=params, timeout=10)
+        response = session.get(url, params=params, timeout=10)
         if response.status_code == 200:
             data = response.json()
             if data.get("items"):
@@ -126,25 +241,26 @@ def search_google_image(query):
 # ==========================
 # 📰 News Fetching
 # ==========================
-def fetch_latest_news():
-    """Fetch latest anime news from ANN RSS, excluding non-news."""
-    news_items = []
-    for feed_url in FEEDS:
+def iter_latest_news(posted_set):
+    """Lazily yield latest anime news from ANN RSS, excluding non-news."""
+    # Fetch all feeds concurrently so extra feeds don't add latency
+    with ThreadPoolExecutor(max_workers=max(1, len(FEEDS))) as executor:
+        futures = [executor.submit(feedparser.parse, feed_url) for feed_url in FEEDS]
+    for feed_url, future in zip(FEEDS, futures):
         try:
-            feed = feedparser.parse(feed_url)
+            feed = future.result()
             print(f"📡 Parsing ANN feed: {len(feed.entries)} entries found.")
             for entry in feed.entries[:5]:  # Latest 5
                 title = entry.title
                 link = entry.link
+                if link in posted_set:
+                    continue  # Already posted; skip before any image work
                 # Debug: Log tags
                 tags = [tag.term.lower() for tag in entry.tags] if hasattr(entry, 'tags') else []
                 print(f"ℹ️ Entry: {title}, Tags: {tags}")
                 # Filter for news
-                is_news = False
-                exclude_terms = ['review', 'interview', 'column', 'editorial', 'interest']
-                if hasattr(entry, 'tags'):
-                    is_news = any(tag.term.lower() in ['news', 'press release', 'announcement'] for tag in entry.tags)
-                if not is_news and not any(term in title.lower() for term in exclude_terms):
+                is_news = not NEWS_TAGS.isdisjoint(tags)
+                if not is_news and not EXCLUDE_RE.search(title):
                     is_news = True  # Include if no exclude terms
                 if not is_news:
                     print(f"ℹ️ Skipping non-news: {title}")
@@ -158,23 +274,25 @@ def fetch_latest_news():
                             image_url = enc.get('href')
                             break
                 elif hasattr(entry, 'content') and entry.content:
-                    soup = BeautifulSoup(entry.content[0].value, 'html.parser')
+                    soup = BeautifulSoup(entry.content[0].value, HTML_PARSER)
                     img = soup.find('img')
                     if img and img.get('src'):
                         image_url = img['src']
                 if not image_url:
                     image_url = scrape_article_image(link)
-                news_items.append({"title": title, "link": link, "image_url": image_url})
+                yield {"title": title, "link": link, "image_url": image_url}
         except Exception as e:
             print(f"⚠️ Error fetching {feed_url}: {e}")
-    print(f"📈 Fetched {len(news_items)} anime news articles.")
-    return news_items
 
 # ==========================
 # 🤖 Rewriting Function
 # ==========================
 def rewrite_news(title):
-    """Ask GPT to rewrite the news headline with a natural tone."""
+    """Ask GPT to rewrite the news headline with a natural tone; result fits a tweet."""
+    cached = load_rewrites().get(rewrite_key(title))
+    if isinstance(cached, str) and cached:
+        print(f"♻️ Reusing cached rewrite for: {title}")
+        return fit_tweet(cached)
     prompt = (
         f"Rewrite this anime news headline to make it sound more natural and engaging for X (Twitter), "
         f"while keeping it factual and under 240 characters. If it sounds like a rumor, start with 'Rumor:'.\n\n"
@@ -187,64 +305,66 @@ def rewrite_news(title):
             temperature=0.8,
             max_tokens=100
         )
-        return response.choices[0].message.content.strip()
+        text = fit_tweet(response.choices[0].message.content.strip())
     except Exception as e:
         print(f"❌ OpenAI error: {e}")
-        return title
+        return fit_tweet(title)
+    try:
+        save_rewrite(title, text)
+    except OSError as e:
+        print(f"⚠️ Could not cache rewrite: {e}")
+    return text
 
 # ==========================
 # 🐦 Tweeting
 # ==========================
-def post_tweet(text, image_url, fallback_query):
-    if len(text) > 280:
-        text = text[:277] + "..."
-    final_image_url = image_url
-    if not final_image_url:
+def resolve_image(image_url, fallback_query):
+    """Find and download an image for the tweet, falling back to Google search."""
+    if not image_url:
         print(f"🔄 No RSS/article image; using Google image search for '{fallback_query}'.")
-        final_image_url = search_google_image(fallback_query)
-    if not final_image_url:
+        image_url = search_google_image(fallback_query)
+    if not image_url:
         print("⚠️ No image found; skipping tweet.")
-        return False
+        return None
+    temp_file = download_image(image_url)
+    if not temp_file:
+        print(f"⚠️ Image download failed for {image_url}; skipping tweet.")
+    return temp_file
+
+def post_tweet(text, temp_file):
     try:
-        temp_file = download_image(final_image_url)
-        if temp_file:
-            try:
-                media = api.media_upload(temp_file)
-                twitter.create_tweet(text=text, media_ids=[media.media_id])
-                print(f"✅ Posted with image: {text[:100]}...")
-                return True
-            finally:
-                os.remove(temp_file)
-        else:
-            print(f"⚠️ Image download failed for {final_image_url}; skipping tweet.")
-            return False
+        media = api.media_upload(temp_file)
+        twitter.create_tweet(text=text, media_ids=[media.media_id])
+        print(f"✅ Posted with image: {text[:100]}...")
+        return True
     except Exception as e:
         print(f"❌ Tweet failed: {e}")
         return False
+    finally:
+        os.remove(temp_file)
 
 # ==========================
 # 🚀 Main Bot
 # ==========================
 def run_bot():
-    posted = load_posted()
-    news_list = fetch_latest_news()
-
-    if not news_list:
-        print("⚠️ No anime news articles found; skipping run.")
-        return
-
-    for item in news_list:
-        if item["link"] in posted:
-            continue
-
-        tweet_text = rewrite_news(item["title"])
-        success = post_tweet(tweet_text, item["image_url"], f"anime {tweet_text}")
-        if success:
-            posted.append(item["link"])
-            save_posted(posted)
-            break  # One per run
-    else:
-        print("⚠️ No new news articles; try next run.")
+    posted_set = set(load_posted())
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        for item in iter_latest_news(posted_set):
+            # The rewrite and the image lookup are independent; run them side by side
+            rewrite_future = executor.submit(rewrite_news, item["title"])
+            image_future = executor.submit(resolve_image, item["image_url"], f"anime {item['title']}")
+            temp_file = image_future.result()
+            try:
+                tweet_text = rewrite_future.result()
+            except Exception:
+                if temp_file:
+                    os.remove(temp_file)  # post_tweet won't run to clean it up
+                raise
+            if temp_file and post_tweet(tweet_text, temp_file):
+                save_posted(item["link"])
+                break  # One per run
+        else:
+            print("⚠️ No new news articles; try next run.")
 
 if __name__ == "__main__":
     try: